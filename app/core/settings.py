@@ -1,11 +1,41 @@
 from typing import Literal
+from pydantic import Field
 from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
     env: Literal['production'] | Literal['development'] = "production"
     database_url: str
     database_index: str
+    # a single shard per node is plenty for one user, scale these up with the cluster
+    database_shards: int = 1
+    # the docker compose cluster is a single node, replicas could never be assigned there
+    database_replicas: int = 0
+    # documents ingested without a user id are assigned to this user
+    default_user_id: str = "default"
+    # number of audio chunks sent to the transcription API at once
+    transcription_concurrency: int = 4
+    audio_max_chunk_seconds: float = 60
+    # defaults for how hybrid search fuses its lexical and vector legs, can be overridden per request
+    search_fusion: Literal['rrf'] | Literal['weighted'] = "rrf"
+    search_lexical_weight: float = Field(0.5, ge=0, le=1)
+    search_fuzziness: str = "AUTO"
+    # timeline windows kept in memory per worker, and how many search hits get theirs prefetched
+    timeline_cache_size: int = 512
+    timeline_cache_ttl_seconds: float = 300
+    # should match the index's refresh_interval, new memories aren't searchable for this long
+    timeline_cache_refresh_seconds: float = 1
+    timeline_prefetch_top_k: int = 3
+    timeline_prefetch_concurrency: int = 2
+    # admission control, interactive search is kept responsive by shedding load instead of queueing forever
+    interactive_concurrency: int = 8
+    interactive_queue_size: int = 64
+    interactive_queue_wait_seconds: float = 1
+    ingest_concurrency: int = 2
+    ingest_queue_size: int = 32
+    ingest_queue_wait_seconds: float = 30
     storage_path: str
+    # queries have to be encoded with the same model the documents were, backfill after changing it
+    embedding_model: str = "sentence-transformers/all-MiniLM-L6-v2"
     openai_api_key: str
     geoapify_api_key: str
 
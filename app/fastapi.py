@@ -1,6 +1,9 @@
 from fastapi import FastAPI, APIRouter
 from fastapi.staticfiles import StaticFiles
 
+from app.modules.admission import AdmissionMiddleware, admission
+from app.routes import admission as admission_routes
+from app.routes import events
 from app.routes import memory
 from app.routes import upload
 
@@ -10,5 +13,17 @@ app = FastAPI(title="Memento API", version="0.1.0")
 api = APIRouter(prefix="/api")
 api.include_router(upload.router)
 api.include_router(memory.router)
+api.include_router(events.router)
+api.include_router(admission_routes.router)
 
-app.include_router(api)
\ No newline at end of file
+app.include_router(api)
+
+# the events stream is long lived and cheap, it isn't admission controlled
+app.add_middleware(
+    AdmissionMiddleware,
+    controller=admission,
+    routes={
+        "/api/memory": "interactive",
+        "/api/upload": "ingest",
+    }
+)
\ No newline at end of file
@@ -0,0 +1,19 @@
+from .controller import AdmissionController, Lane, Overloaded
+from .middleware import AdmissionMiddleware
+from app.core.settings import settings
+
+# in priority order, interactive search is always admitted before ingest
+admission = AdmissionController([
+    Lane(
+        name="interactive",
+        max_concurrency=settings.interactive_concurrency,
+        max_queue=settings.interactive_queue_size,
+        max_queue_wait=settings.interactive_queue_wait_seconds,
+    ),
+    Lane(
+        name="ingest",
+        max_concurrency=settings.ingest_concurrency,
+        max_queue=settings.ingest_queue_size,
+        max_queue_wait=settings.ingest_queue_wait_seconds,
+    ),
+])
@@ -0,0 +1,151 @@
+import asyncio
+import math
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Deque, Dict, List
+
+
+class Overloaded(Exception):
+    """Raised when a request is shed instead of admitted."""
+
+    def __init__(self, lane: str, reason: str, retry_after: int):
+        super().__init__(f"{lane} is overloaded: {reason}")
+        self.lane = lane
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+@dataclass
+class Lane:
+    """A class of requests with its own concurrency budget and bounded queue."""
+    name: str
+    max_concurrency: int
+    max_queue: int
+    # queue-time SLO, requests that wait longer than this are shed
+    max_queue_wait: float
+    in_flight: int = 0
+    waiters: Deque[asyncio.Future] = field(default_factory=deque)
+    admitted: int = 0
+    shed: int = 0
+    # exponentially weighted moving averages, in seconds
+    avg_wait: float = 0
+    avg_service: float = 0
+    max_wait: float = 0
+
+    def record_wait(self, wait: float):
+        self.admitted += 1
+        self.avg_wait = wait if self.admitted == 1 else 0.9 * self.avg_wait + 0.1 * wait
+        self.max_wait = max(self.max_wait, wait)
+
+    def record_service(self, duration: float):
+        self.avg_service = duration if not self.avg_service else 0.9 * self.avg_service + 0.1 * duration
+
+    def retry_after(self) -> int:
+        # roughly how long until the queue ahead of a new request has drained
+        drain = self.avg_service * (len(self.waiters) + 1) / self.max_concurrency
+        return max(1, math.ceil(drain))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "in_flight": self.in_flight,
+            "queued": len(self.waiters),
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "max_queue_wait_ms": self.max_queue_wait * 1000,
+            "admitted": self.admitted,
+            "shed": self.shed,
+            "avg_wait_ms": self.avg_wait * 1000,
+            "max_wait_ms": self.max_wait * 1000,
+            "avg_service_ms": self.avg_service * 1000,
+        }
+
+
+class AdmissionController:
+    """
+    Admits requests into per-lane concurrency budgets. Lanes are given in
+    priority order: a lane is only admitted into while no higher priority lane
+    has requests queued, so interactive search never waits behind bulk ingest.
+
+    All state is only touched from the event loop, so no locking is needed.
+    """
+
+    def __init__(self, lanes: List[Lane]):
+        self.lanes = {lane.name: lane for lane in lanes}
+        self.priority = [lane.name for lane in lanes]
+
+    def _higher_priority_waiting(self, lane: Lane) -> bool:
+        for name in self.priority:
+            if name == lane.name:
+                return False
+            if self.lanes[name].waiters:
+                return True
+        return False
+
+    def _has_capacity(self, lane: Lane) -> bool:
+        return lane.in_flight < lane.max_concurrency and not self._higher_priority_waiting(lane)
+
+    def _wake(self):
+        for name in self.priority:
+            lane = self.lanes[name]
+            while lane.waiters and self._has_capacity(lane):
+                waiter = lane.waiters.popleft()
+                if waiter.done():
+                    continue
+                lane.in_flight += 1
+                waiter.set_result(None)
+
+    def _shed(self, lane: Lane, reason: str) -> Overloaded:
+        lane.shed += 1
+        return Overloaded(lane.name, reason, lane.retry_after())
+
+    async def acquire(self, name: str) -> float:
+        """Wait for a slot in the lane, returns the time spent queued."""
+        lane = self.lanes[name]
+
+        if not lane.waiters and self._has_capacity(lane):
+            lane.in_flight += 1
+            lane.record_wait(0)
+            return 0
+
+        if len(lane.waiters) >= lane.max_queue:
+            raise self._shed(lane, "queue is full")
+
+        started_at = time.monotonic()
+        waiter = asyncio.get_running_loop().create_future()
+        lane.waiters.append(waiter)
+
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), lane.max_queue_wait)
+        except asyncio.TimeoutError:
+            # the slot may have been handed over just as the timeout fired
+            if not waiter.done():
+                waiter.cancel()
+                lane.waiters.remove(waiter)
+                # lower priority lanes may have been held back by this waiter
+                self._wake()
+                raise self._shed(lane, "queue wait exceeded")
+        except asyncio.CancelledError:
+            # the client went away while queued
+            if waiter.done() and not waiter.cancelled():
+                self.release(name)
+            else:
+                waiter.cancel()
+                if waiter in lane.waiters:
+                    lane.waiters.remove(waiter)
+                self._wake()
+            raise
+
+        wait = time.monotonic() - started_at
+        lane.record_wait(wait)
+        return wait
+
+    def release(self, name: str, duration: float = None):
+        lane = self.lanes[name]
+        lane.in_flight -= 1
+        if duration is not None:
+            lane.record_service(duration)
+        self._wake()
+
+    def stats(self) -> Dict[str, Any]:
+        return {name: self.lanes[name].stats() for name in self.priority}
@@ -0,0 +1,68 @@
+import time
+from typing import Dict
+
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from .controller import AdmissionController, Overloaded
+
+
+class AdmissionMiddleware:
+    """
+    Puts requests whose path starts with one of `routes` through the lane it
+    maps to, and answers with a 503 and Retry-After when the lane sheds them.
+    """
+
+    def __init__(self, app: ASGIApp, controller: AdmissionController, routes: Dict[str, str]):
+        self.app = app
+        self.controller = controller
+        self.routes = routes
+
+    def _lane(self, path: str):
+        for prefix, lane in self.routes.items():
+            if path.startswith(prefix):
+                return lane
+        return None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        lane = self._lane(scope["path"]) if scope["type"] == "http" else None
+        if lane is None:
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            wait = await self.controller.acquire(lane)
+        except Overloaded as e:
+            response = JSONResponse(
+                status_code=503,
+                content={"detail": str(e)},
+                headers={"Retry-After": str(e.retry_after)}
+            )
+            await response(scope, receive, send)
+            return
+
+        started_at = time.monotonic()
+        released = False
+
+        def release():
+            nonlocal released
+            if not released:
+                released = True
+                self.controller.release(lane, time.monotonic() - started_at)
+
+        async def send_with_wait(message: Message):
+            if message["type"] == "http.response.start":
+                message["headers"] = [
+                    *message.get("headers", []),
+                    (b"x-queue-wait-ms", f"{wait * 1000:.1f}".encode()),
+                ]
+            await send(message)
+
+            # background tasks run after the response is sent, they don't get to hold the slot
+            if message["type"] == "http.response.body" and not message.get("more_body", False):
+                release()
+
+        try:
+            await self.app(scope, receive, send_with_wait)
+        finally:
+            release()
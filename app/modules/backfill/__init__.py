@@ -0,0 +1 @@
+from .reembed import BackfillCheckpoint, EmbeddingBackfill
@@ -0,0 +1,33 @@
+import argparse
+import os
+
+from app.core.settings import settings
+from app.modules.backfill import EmbeddingBackfill
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-embed existing memories with a new embedding model.")
+    parser.add_argument("--model", default=settings.embedding_model, help="embedding model to backfill with, defaults to the one the app uses")
+    parser.add_argument("--checkpoint", default=".backfill-checkpoint.json", help="where to persist progress")
+    parser.add_argument("--rerun-ocr", action="store_true", help="rerun OCR on the stored images before embedding")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="number of encoding processes")
+    parser.add_argument("--page-size", type=int, default=2000, help="documents fetched and written per batch")
+    parser.add_argument("--max-docs-per-second", type=float, default=None, help="throttle to go easy on the cluster")
+    args = parser.parse_args()
+
+    backfill = EmbeddingBackfill(
+        settings.database_url,
+        settings.database_index,
+        embedding_model=args.model,
+        checkpoint_path=args.checkpoint,
+        storage_path=settings.storage_path,
+        rerun_ocr=args.rerun_ocr,
+        workers=args.workers,
+        page_size=args.page_size,
+        max_docs_per_second=args.max_docs_per_second,
+    )
+    backfill.run()
+
+
+if __name__ == "__main__":
+    main()
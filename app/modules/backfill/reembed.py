@@ -0,0 +1,309 @@
+import json
+import os
+import time
+import traceback
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import asdict, dataclass, field
+from multiprocessing import get_context
+from typing import Any, Dict, List, Optional
+
+from elasticsearch import Elasticsearch
+from elasticsearch.helpers import bulk
+
+# populated inside each worker process by `_init_worker`
+_worker_model = None
+_worker_storage_path: Optional[str] = None
+_worker_rerun_ocr = False
+
+SOURCE_FIELDS = ["id", "image_path", "llm_description", "transcript", "ocr_text", "timestamp"]
+
+
+@dataclass
+class BackfillCheckpoint:
+    """Progress persisted between runs so an interrupted backfill can resume."""
+    embedding_model: str
+    search_after: Optional[List[Any]] = None
+    processed: int = 0
+    failed: int = 0
+    started_at: float = field(default_factory=time.time)
+
+    @classmethod
+    def load(cls, path: str, embedding_model: str) -> "BackfillCheckpoint":
+        if not os.path.exists(path):
+            return cls(embedding_model=embedding_model)
+
+        with open(path) as f:
+            data = json.load(f)
+
+        # a checkpoint for another model is stale, start over
+        if data.get("embedding_model") != embedding_model:
+            return cls(embedding_model=embedding_model)
+
+        return cls(**data)
+
+    def save(self, path: str):
+        # write to a temp file first so a crash never leaves a half-written checkpoint
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(asdict(self), f)
+        os.replace(tmp_path, path)
+
+
+def _init_worker(embedding_model: str, storage_path: Optional[str], rerun_ocr: bool):
+    global _worker_model, _worker_storage_path, _worker_rerun_ocr
+
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    # every worker gets its own core, don't let torch oversubscribe the box
+    torch.set_num_threads(1)
+
+    _worker_model = SentenceTransformer(embedding_model)
+    _worker_storage_path = storage_path
+    _worker_rerun_ocr = rerun_ocr
+
+
+def _rerun_ocr(image_path: str) -> Optional[str]:
+    from PIL import Image
+    from app.modules.metadata_extraction.ocr import extract_text_from_image
+
+    file_path = os.path.join(_worker_storage_path, os.path.basename(image_path))
+    if not os.path.exists(file_path):
+        return None
+
+    with Image.open(file_path) as image:
+        return extract_text_from_image(image)
+
+
+def _encode_chunk(docs: List[Dict[str, Any]], embedding_model: str) -> List[Dict[str, Any]]:
+    """Re-encode a chunk of documents and return the partial updates for them."""
+    if _worker_rerun_ocr:
+        for doc in docs:
+            if not doc.get("image_path"):
+                continue
+            ocr_text = _rerun_ocr(doc["image_path"])
+            if ocr_text is not None:
+                doc["ocr_text"] = ocr_text
+
+    # audio segments keep their transcript's embedding in the description vector
+    descriptions = [doc.get("llm_description") or doc.get("transcript") or "" for doc in docs]
+    description_vectors = _worker_model.encode(descriptions, batch_size=64)
+
+    ocr_docs = [i for i, doc in enumerate(docs) if doc.get("ocr_text")]
+    ocr_vectors = _worker_model.encode([docs[i]["ocr_text"] for i in ocr_docs], batch_size=64) if ocr_docs else []
+    ocr_by_index = dict(zip(ocr_docs, ocr_vectors))
+
+    updates = []
+    for i, doc in enumerate(docs):
+        update = {
+            "llm_description_vector": description_vectors[i].tolist(),
+            "ocr_text_vector": ocr_by_index[i].tolist() if i in ocr_by_index else None,
+            "embedding_model": embedding_model,
+        }
+        if _worker_rerun_ocr:
+            update["ocr_text"] = doc.get("ocr_text")
+        updates.append({"_id": doc["_id"], "_routing": doc.get("_routing"), "doc": update})
+
+    return updates
+
+
+class EmbeddingBackfill:
+    """
+    Recomputes `llm_description_vector` and `ocr_text_vector` for documents that
+    were embedded with a different model than `embedding_model`.
+
+    The index is streamed with a point-in-time and `search_after`, each page is
+    encoded across a process pool while the next page is fetched, and vectors
+    are written back with bulk partial updates. Progress is checkpointed after
+    every page so the job can be interrupted and resumed.
+    """
+
+    def __init__(
+        self,
+        elastic_host: str,
+        index_name: str,
+        embedding_model: str,
+        checkpoint_path: str,
+        storage_path: Optional[str] = None,
+        rerun_ocr: bool = False,
+        workers: int = os.cpu_count() or 1,
+        page_size: int = 2000,
+        max_docs_per_second: Optional[float] = None,
+        keep_alive: str = "5m",
+    ):
+        if rerun_ocr and not storage_path:
+            raise ValueError("storage_path is required to rerun OCR")
+
+        self.es = Elasticsearch(elastic_host, request_timeout=120)
+        self.index_name = index_name
+        self.embedding_model = embedding_model
+        self.checkpoint_path = checkpoint_path
+        self.storage_path = storage_path
+        self.rerun_ocr = rerun_ocr
+        self.workers = max(1, workers)
+        self.page_size = page_size
+        self.max_docs_per_second = max_docs_per_second
+        self.keep_alive = keep_alive
+
+    def _pending_query(self) -> Dict[str, Any]:
+        """Documents that still need to be embedded with the target model."""
+        if self.rerun_ocr:
+            return {"match_all": {}}
+
+        return {
+            "bool": {
+                "must_not": [
+                    {"term": {"embedding_model": self.embedding_model}}
+                ]
+            }
+        }
+
+    def _ensure_mapping(self):
+        self.es.indices.put_mapping(
+            index=self.index_name,
+            properties={"embedding_model": {"type": "keyword"}}
+        )
+
+    def _check_dimensions(self):
+        """Partial updates can't change a dense_vector's dims, fail before doing any work."""
+        from sentence_transformers import SentenceTransformer
+
+        dims = SentenceTransformer(self.embedding_model).get_sentence_embedding_dimension()
+        mapping = self.es.indices.get_mapping(index=self.index_name)
+        properties = mapping[self.index_name]["mappings"]["properties"]
+
+        for vector_field in ["llm_description_vector", "ocr_text_vector"]:
+            mapped_dims = properties.get(vector_field, {}).get("dims")
+            if mapped_dims and mapped_dims != dims:
+                raise ValueError(
+                    f"{self.embedding_model} produces {dims} dimensional vectors but "
+                    f"{vector_field} is mapped with {mapped_dims}, the index needs to be recreated"
+                )
+
+    def _fetch_page(self, pit_id: str, search_after: Optional[List[Any]]) -> Dict[str, Any]:
+        search_kwargs = {}
+        if search_after:
+            search_kwargs["search_after"] = search_after
+
+        return self.es.search(
+            pit={"id": pit_id, "keep_alive": self.keep_alive},
+            query=self._pending_query(),
+            source_includes=SOURCE_FIELDS,
+            # sort on document fields rather than _shard_doc so the position
+            # stays valid for a fresh point-in-time after a restart
+            sort=[{"timestamp": "asc"}, {"id": "asc"}],
+            size=self.page_size,
+            track_total_hits=False,
+            **search_kwargs
+        )
+
+    def _submit_page(self, pool: ProcessPoolExecutor, hits: List[Dict[str, Any]]) -> List[Future]:
+        docs = [{"_id": hit["_id"], "_routing": hit.get("_routing"), **hit["_source"]} for hit in hits]
+        chunk_size = max(1, -(-len(docs) // self.workers))
+
+        return [
+            pool.submit(_encode_chunk, docs[i:i + chunk_size], self.embedding_model)
+            for i in range(0, len(docs), chunk_size)
+        ]
+
+    def _write_updates(self, updates: List[Dict[str, Any]]) -> int:
+        actions = ({
+            "_op_type": "update",
+            "_index": self.index_name,
+            "_id": update["_id"],
+            "doc": update["doc"],
+            # documents are routed by user, updates have to go to the same shard
+            **({"_routing": update["_routing"]} if update["_routing"] else {}),
+        } for update in updates)
+
+        _, errors = bulk(self.es, actions, raise_on_error=False, refresh=False)
+        for error in errors:
+            print(f"Error updating document: {error}")
+
+        return len(errors)
+
+    def _throttle(self, docs: int, elapsed: float):
+        if not self.max_docs_per_second:
+            return
+
+        min_elapsed = docs / self.max_docs_per_second
+        if elapsed < min_elapsed:
+            time.sleep(min_elapsed - elapsed)
+
+    def _report(self, checkpoint: BackfillCheckpoint, total: int, run_processed: int, run_started_at: float):
+        elapsed = time.time() - run_started_at
+        rate = run_processed / elapsed if elapsed > 0 else 0
+        remaining = max(total - run_processed, 0)
+        eta = f"{remaining / rate / 60:.1f}m" if rate > 0 else "unknown"
+
+        print(
+            f"Backfill: {run_processed}/{total} this run, "
+            f"{checkpoint.processed} total ({checkpoint.failed} failed), "
+            f"{rate:.1f} docs/s, ETA {eta}"
+        )
+
+    def run(self) -> BackfillCheckpoint:
+        self._ensure_mapping()
+        self._check_dimensions()
+
+        checkpoint = BackfillCheckpoint.load(self.checkpoint_path, self.embedding_model)
+        total = self.es.count(index=self.index_name, query=self._pending_query())["count"]
+        print(f"Backfill: {total} documents pending for {self.embedding_model}")
+
+        pit_id = self.es.open_point_in_time(index=self.index_name, keep_alive=self.keep_alive)["id"]
+        pool = ProcessPoolExecutor(
+            max_workers=self.workers,
+            # spawn rather than fork, torch doesn't survive being forked once initialized
+            mp_context=get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(self.embedding_model, self.storage_path, self.rerun_ocr),
+        )
+
+        run_processed = 0
+        run_started_at = time.time()
+
+        try:
+            response = self._fetch_page(pit_id, checkpoint.search_after)
+
+            while True:
+                page_started_at = time.time()
+                pit_id = response.get("pit_id", pit_id)
+                hits = response["hits"]["hits"]
+                if not hits:
+                    break
+
+                futures = self._submit_page(pool, hits)
+
+                # fetch the next page while the current one is being encoded
+                next_response = self._fetch_page(pit_id, hits[-1]["sort"])
+
+                updates = []
+                for future in futures:
+                    updates.extend(future.result())
+
+                failed = self._write_updates(updates)
+
+                checkpoint.search_after = hits[-1]["sort"]
+                checkpoint.processed += len(hits) - failed
+                checkpoint.failed += failed
+                checkpoint.save(self.checkpoint_path)
+
+                run_processed += len(hits)
+                self._report(checkpoint, total, run_processed, run_started_at)
+                self._throttle(len(hits), time.time() - page_started_at)
+
+                response = next_response
+
+            # the job is done, the next run should start from the beginning
+            if os.path.exists(self.checkpoint_path):
+                os.remove(self.checkpoint_path)
+        except KeyboardInterrupt:
+            print(f"Backfill interrupted, resume from {self.checkpoint_path}")
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
+            try:
+                self.es.close_point_in_time(id=pit_id)
+            except Exception:
+                traceback.print_exc()
+
+        return checkpoint
@@ -1,7 +1,17 @@
-from .db import ImageSearchSystem
+from .db import DEFAULT_FIELDS, RESPONSE_FIELDS, ImageSearchSystem
+from .timeline_cache import TimelineCache
 from app.core.settings import settings
 
 elastic = ImageSearchSystem(
     settings.database_url,
     settings.database_index,
+    embedding_model=settings.embedding_model,
+    number_of_shards=settings.database_shards,
+    number_of_replicas=settings.database_replicas,
+    timeline_cache=TimelineCache(
+        max_entries=settings.timeline_cache_size,
+        ttl_seconds=settings.timeline_cache_ttl_seconds,
+        refresh_interval=settings.timeline_cache_refresh_seconds,
+    ),
+    default_user_id=settings.default_user_id,
 )
@@ -1,25 +1,108 @@
 import traceback
-from elasticsearch import ApiError, Elasticsearch
-from typing import Dict, List, Literal, Optional, Any, Union
+from elasticsearch import ApiError, Elasticsearch, NotFoundError
+from typing import Dict, List, Literal, Optional, Any, Tuple, Union
 from datetime import datetime
+import time
 import uuid
 from sentence_transformers import SentenceTransformer
 
+from .fusion import FusionStrategy, fuse
+from .timeline_cache import Timestamp, TimelineCache
+
 script_source = """double llm_score = !doc['llm_description_vector'].isEmpty() ? cosineSimilarity(params.query_vector, 'llm_description_vector') + 1.0 : 0;
 double ocr_score = !doc['ocr_text_vector'].isEmpty() ? cosineSimilarity(params.query_vector, 'ocr_text_vector') + 1.0 : 0;
 return llm_score * 2 + ocr_score;
 """
 
+# audio memories are indexed next to the images, one document per transcribed segment
+AUDIO_PROPERTIES = {
+    "media_type": {"type": "keyword"},
+    "audio_path": {"type": "keyword"},
+    "recording_id": {"type": "keyword"},
+    "offset_seconds": {"type": "float"},
+    "duration_seconds": {"type": "float"},
+    "transcript": {
+        "type": "text",
+        "analyzer": "english"
+    },
+}
+
+TEXT_FIELDS = [
+    "llm_description^2",
+    "transcript^2",
+    "ocr_text",
+    "address",
+    "city",
+    "state",
+    "country"
+]
+
+
+# response field -> field in the document's _source
+RESPONSE_FIELDS = {
+    "id": "id",
+    "timestamp": "timestamp",
+    "media_type": "media_type",
+    "image_path": "image_path",
+    "audio_path": "audio_path",
+    "offset_seconds": "offset_seconds",
+    "ocr_text": "ocr_text",
+    "description": "llm_description",
+    "transcript": "transcript",
+    "coords": "location",
+    "address": "address",
+    "city": "city",
+    "state": "state",
+    "zip": "zip",
+    "country": "country",
+    # "metadata": "metadata",
+    # "tags": "tags",
+}
+
+# list views only render a thumbnail on a map or a timeline, full details are fetched by id
+DEFAULT_FIELDS = ["id", "timestamp", "media_type", "image_path", "audio_path", "coords"]
+
+
+def _storage_url(path: Optional[str]) -> Optional[str]:
+    return f'/storage/{path.split("/")[-1]}' if path else None
+
+
+def _source_includes(fields: List[str]) -> List[str]:
+    return [RESPONSE_FIELDS[field] for field in fields]
+
+
+def _format_hit(source: Dict[str, Any], fields: List[str]) -> Dict[str, Any]:
+    result = {}
+
+    for field in fields:
+        value = source.get(RESPONSE_FIELDS[field])
+        if field in ("image_path", "audio_path"):
+            value = _storage_url(value)
+        elif field == "media_type":
+            value = value or "image"
+        result[field] = value
+
+    return result
+
 class ImageSearchSystem:
     def __init__(
         self,
         elastic_host: str,
         index_name: str,
-        embedding_model: str = "sentence-transformers/all-MiniLM-L6-v2"
+        embedding_model: str = "sentence-transformers/all-MiniLM-L6-v2",
+        number_of_shards: int = 1,
+        number_of_replicas: int = 0,
+        timeline_cache: Optional[TimelineCache] = None,
+        default_user_id: str = "default"
     ):
         self.es = Elasticsearch(elastic_host)
         self.index_name = index_name
+        self.default_user_id = default_user_id
+        self.number_of_shards = number_of_shards
+        self.number_of_replicas = number_of_replicas
+        self.timeline_cache = timeline_cache or TimelineCache()
         # Initialize the embedding model
+        self.embedding_model_name = embedding_model
         self.embedding_model = SentenceTransformer(embedding_model)
         self._create_index_if_not_exists()
 
@@ -27,8 +110,11 @@ class ImageSearchSystem:
         """Create the Elasticsearch index with appropriate mappings if it doesn't exist."""
         if not self.es.indices.exists(index=self.index_name):
             mappings = {
+                # every document belongs to a user and is routed to that user's shard
+                "_routing": {"required": True},
                 "properties": {
                     "id": {"type": "keyword"},
+                    "user_id": {"type": "keyword"},
                     "image_path": {"type": "keyword"},
                     "llm_description": {
                         "type": "text",
@@ -73,7 +159,10 @@ class ImageSearchSystem:
                         "dynamic": True
                     },
                     "tags": {"type": "keyword"},
-                    "timestamp": {"type": "date"}
+                    "timestamp": {"type": "date"},
+                    **AUDIO_PROPERTIES,
+                    # which model produced the vectors, used by the backfill job
+                    "embedding_model": {"type": "keyword"}
                 }
             }
 
@@ -83,11 +172,53 @@ class ImageSearchSystem:
                 mappings=mappings,
                 settings={
                     "index": {
-                        "number_of_shards": 1,
-                        "number_of_replicas": 1
+                        "number_of_shards": self.number_of_shards,
+                        "number_of_replicas": self.number_of_replicas
                     }
                 }
             )
+        else:
+            # the shard count is fixed at creation, but replicas can be changed on the fly
+            self.es.indices.put_settings(
+                index=self.index_name,
+                settings={"index": {"number_of_replicas": self.number_of_replicas}}
+            )
+            # fields added after the index was created, mapped explicitly before
+            # the first write so dynamic mapping can't turn them into text
+            self.es.indices.put_mapping(
+                index=self.index_name,
+                properties={
+                    "user_id": {"type": "keyword"},
+                    "embedding_model": {"type": "keyword"},
+                    **AUDIO_PROPERTIES
+                }
+            )
+            self._assign_default_user()
+
+    def _assign_default_user(self):
+        """
+        One-time migration for memories indexed before there were users, they
+        would be filtered out of every query otherwise. Indexes that old have a
+        single shard, so they don't need to be rerouted by user.
+        """
+        missing_user = {"bool": {"must_not": [{"exists": {"field": "user_id"}}]}}
+
+        if not self.es.count(index=self.index_name, query=missing_user)["count"]:
+            return
+
+        task = self.es.update_by_query(
+            index=self.index_name,
+            query=missing_user,
+            script={
+                "source": "ctx._source.user_id = params.user_id",
+                "params": {"user_id": self.default_user_id}
+            },
+            conflicts="proceed",
+            refresh=True,
+            # don't hold up startup on a large index, the task is safe to rerun if it's interrupted
+            wait_for_completion=False
+        )
+        print(f"Assigning memories without a user to {self.default_user_id}, task {task['task']}")
 
     def _generate_embeddings(self, text: str) -> List[float]:
         """Generate embeddings for the given text."""
@@ -95,6 +226,7 @@ class ImageSearchSystem:
 
     def ingest_image_metadata(
         self,
+        user_id: str,
         image_path: str,
         llm_description: str,
         timestamp: datetime = None,
@@ -104,7 +236,12 @@ class ImageSearchSystem:
         additional_metadata: Optional[Dict[str, Any]] = None,
         custom_id: Optional[str] = None
     ) -> str:
-        """Ingest image metadata into Elasticsearch with vector embeddings."""
+        """
+        Ingest image metadata into Elasticsearch with vector embeddings.
+
+        Documents are routed by `user_id` so all of a user's memories live on the
+        same shard and their queries only need to hit that one shard.
+        """
         doc_id = custom_id or str(uuid.uuid4())
         
         # Generate embeddings for description and OCR text
@@ -112,11 +249,13 @@ class ImageSearchSystem:
         
         document = {
             "id": doc_id,
+            "user_id": user_id,
             "image_path": image_path,
             "llm_description": llm_description,
             "llm_description_vector": description_embedding,
             "timestamp": timestamp,
-            "tags": tags or []
+            "tags": tags or [],
+            "embedding_model": self.embedding_model_name
         }
 
         if ocr_text:
@@ -125,28 +264,81 @@ class ImageSearchSystem:
             document["ocr_text_vector"] = ocr_embedding
 
         if location_data:
-            if 'latitude' in location_data and 'longitude' in location_data:
-                document["location"] = {
-                    "lat": location_data["latitude"],
-                    "lon": location_data["longitude"]
-                }
-            
-            for field in ['address', 'city', 'state', 'zip', 'country']:
-                if field in location_data:
-                    document[field] = location_data[field]
+            document.update(self._location_fields(location_data))
 
         if additional_metadata:
             document["metadata"] = additional_metadata
 
         try:
-            self.es.index(index=self.index_name, id=doc_id, document=document)
+            self.es.index(index=self.index_name, id=doc_id, document=document, routing=user_id)
+            self.timeline_cache.invalidate(user_id, timestamp)
             return doc_id
         except Exception as e:
             print(f"Error ingesting document: {e}")
             raise
 
+    def _location_fields(self, location_data: Dict[str, Any]) -> Dict[str, Any]:
+        fields = {}
+
+        if 'latitude' in location_data and 'longitude' in location_data:
+            fields["location"] = {
+                "lat": location_data["latitude"],
+                "lon": location_data["longitude"]
+            }
+
+        for field in ['address', 'city', 'state', 'zip', 'country']:
+            if field in location_data:
+                fields[field] = location_data[field]
+
+        return fields
+
+    def ingest_audio_segment(
+        self,
+        user_id: str,
+        audio_path: str,
+        recording_id: str,
+        segment_index: int,
+        transcript: str,
+        timestamp: datetime,
+        offset_seconds: float,
+        duration_seconds: float,
+        location_data: Optional[Dict[str, Any]] = None,
+    ) -> str:
+        """
+        Ingest one transcribed segment of an audio recording. The transcript is
+        embedded into `llm_description_vector` so segments are found by the same
+        semantic search as the images.
+        """
+        doc_id = f"{recording_id}-{segment_index}"
+
+        document = {
+            "id": doc_id,
+            "user_id": user_id,
+            "media_type": "audio",
+            "audio_path": audio_path,
+            "recording_id": recording_id,
+            "transcript": transcript,
+            "llm_description_vector": self._generate_embeddings(transcript),
+            "timestamp": timestamp,
+            "offset_seconds": offset_seconds,
+            "duration_seconds": duration_seconds,
+            "embedding_model": self.embedding_model_name
+        }
+
+        if location_data:
+            document.update(self._location_fields(location_data))
+
+        try:
+            self.es.index(index=self.index_name, id=doc_id, document=document, routing=user_id)
+            self.timeline_cache.invalidate(user_id, timestamp)
+            return doc_id
+        except Exception as e:
+            print(f"Error ingesting audio segment: {e}")
+            raise
+
     def search_images(
         self,
+        user_id: str,
         query: Optional[str] = None,
         location_filters: Optional[Dict[str, Any]] = None,
         temporal_filters: Optional[Dict[str, Any]] = None,
@@ -156,12 +348,18 @@ class ImageSearchSystem:
             Literal['semantic'],
             Literal['keyword'],
             ] = "keyword",
-        size: int = 10
-    ) -> List[Dict[str, Any]]:
+        size: int = 10,
+        fields: Optional[List[str]] = None,
+        fusion: FusionStrategy = "rrf",
+        lexical_weight: float = 0.5,
+        fuzziness: Optional[str] = "AUTO",
+        debug: bool = False
+    ) -> Union[List[Dict[str, Any]], Dict[str, Any]]:
         """
         Search for images using semantic similarity and/or keyword matching.
         
         Args:
+            user_id: Only search the memories of this user
             query: Natural language query
             location_filters: Geographical and location-based filters
             metadata_filters: Additional filters for metadata fields
@@ -170,72 +368,40 @@ class ImageSearchSystem:
                 - 'semantic': Pure semantic similarity search
                 - 'keyword': Traditional keyword-based search
             size: Number of results to return
+            fields: Response fields to return, see `RESPONSE_FIELDS`. Defaults to `DEFAULT_FIELDS`
+            fusion: How the hybrid legs are combined:
+                - 'rrf': Reciprocal rank fusion
+                - 'weighted': Weighted sum of min-max normalized scores
+            lexical_weight: Weight of the lexical leg for 'weighted' fusion, the vector leg gets the rest
+            fuzziness: Fuzziness of the lexical leg, None disables fuzzy matching
+            debug: Return `{"memories": [...], "debug": {...}}` instead, with the timings of
+                every step, each leg's ES `took` and hit count, and each leg's ES `profile`
         """
-        must_conditions = []
-        filter_conditions = []
+        if not 0 <= lexical_weight <= 1:
+            raise ValueError("lexical_weight has to be between 0 and 1")
+
+        results, debug_info = self._search(
+            user_id, query, location_filters, temporal_filters, metadata_filters,
+            search_type, size, fields, fusion, lexical_weight, fuzziness, profile=debug
+        )
+
+        if debug:
+            return {
+                "memories": results,
+                "debug": debug_info
+            }
 
-        if query:
-            if search_type in ['semantic', 'hybrid']:
-                # Generate query embeddings
-                query_embedding = self._generate_embeddings(query)
-                
-                semantic_query = {
-                    "script_score": {
-                        "min_score": 1.00001,
-                        "query": {"match_all": {}},
-                        "script": {
-                            "source": script_source,
-                            "params": {"query_vector": query_embedding}
-                        }
-                    }
-                }
-                
-                if search_type == 'hybrid':
-                    must_conditions.append({
-                        "bool": {
-                            "should": [
-                                semantic_query,
-                                {
-                                    "multi_match": {
-                                        "query": query,
-                                        "fields": [
-                                            "llm_description^2",
-                                            "ocr_text",
-                                            "address",
-                                            "city",
-                                            "state",
-                                            "country"
-                                        ],
-                                        "type": "best_fields",
-                                        "fuzziness": "AUTO",
-                                        "boost": 2,
-                                    }
-                                }
-                            ]
-                        }
-                    })
-                else:
-                    must_conditions.append(semantic_query)
-                    pass
-            else:
-                # Keyword-only search
-                must_conditions.append({
-                    "multi_match": {
-                        "query": query,
-                        "fields": [
-                            "llm_description^2",
-                            "ocr_text",
-                            "address",
-                            "city",
-                            "state",
-                            "country"
-                        ],
-                        "type": "best_fields",
-                        "fuzziness": "AUTO"
-                    }
-                })
-        else:
-            must_conditions.append({"match_all": {}})
+        return results
+
+    def _search_filters(
+        self,
+        user_id: str,
+        location_filters: Optional[Dict[str, Any]],
+        temporal_filters: Optional[Dict[str, Any]],
+        metadata_filters: Optional[Dict[str, Any]],
+    ) -> List[Dict[str, Any]]:
+        # routing only narrows the search to the user's shard, other users can share it
+        filter_conditions = [{"term": {"user_id": user_id}}]
 
         # Add location and metadata filters
         if location_filters:
@@ -279,50 +445,148 @@ class ImageSearchSystem:
                 }
             })
 
-        # Combine all query components
-        search_body = {
-             "_source": {
-                "exclude": [ "*_vector" ]
-            },
-            "query": {
-                "bool": {
-                    "must": must_conditions,
-                    "filter": filter_conditions
+        return filter_conditions
+
+    def _search(
+        self,
+        user_id: str,
+        query: Optional[str],
+        location_filters: Optional[Dict[str, Any]],
+        temporal_filters: Optional[Dict[str, Any]],
+        metadata_filters: Optional[Dict[str, Any]],
+        search_type: str,
+        size: int,
+        fields: Optional[List[str]],
+        fusion: FusionStrategy,
+        lexical_weight: float,
+        fuzziness: Optional[str],
+        profile: bool,
+    ) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+        """
+        Every query leg is sent as its own search in a single `_msearch` so each
+        leg's cost is visible, then the legs are fused client-side.
+        """
+        fields = fields or DEFAULT_FIELDS
+        filter_conditions = self._search_filters(user_id, location_filters, temporal_filters, metadata_filters)
+        timings = {}
+        legs = {}
+
+        if query:
+            if search_type in ['semantic', 'hybrid']:
+                started_at = time.perf_counter()
+                # Generate query embeddings
+                query_embedding = self._generate_embeddings(query)
+                timings["embedding_ms"] = (time.perf_counter() - started_at) * 1000
+
+                legs["vector"] = {
+                    "script_score": {
+                        "min_score": 1.00001,
+                        "query": {"match_all": {}},
+                        "script": {
+                            "source": script_source,
+                            "params": {"query_vector": query_embedding}
+                        }
+                    }
                 }
-            },
-            "size": size
-        }
-        
-        try:
-            response = self.es.search(
-                index=self.index_name,
-                body=search_body,
-            )
 
-            response_hits = response.get("hits", {}).get("hits", [])
-            
-            return [{
-                "score": hit["_score"],
-                "timestamp": hit["_source"]["timestamp"],
-                "id": hit["_source"]["id"],
-                "image_path": f'/storage/{hit["_source"]["image_path"].split("/")[-1]}',
-                "ocr_text": hit["_source"].get("ocr_text"),
-                "description": hit["_source"]["llm_description"],
-                "coords": hit["_source"].get("location"),
-                "address": hit["_source"].get("address"),
-                "city": hit["_source"].get("city"),
-                "state": hit["_source"].get("state"),
-                "zip": hit["_source"].get("zip"),
-                "country": hit["_source"].get("country"),
-                # "metadata": hit["_source"].get("metadata", {}),
-                # "tags": hit["_source"].get("tags", []),
-            } for hit in response_hits]
-            
+            if search_type in ['keyword', 'hybrid']:
+                multi_match = {
+                    "query": query,
+                    "fields": TEXT_FIELDS,
+                    "type": "best_fields",
+                }
+                if fuzziness:
+                    multi_match["fuzziness"] = fuzziness
+                legs["lexical"] = {"multi_match": multi_match}
+        else:
+            legs["all"] = {"match_all": {}}
+
+        # fused legs need to look deeper than `size` so hits ranked lower in one leg can still surface
+        window = size if len(legs) == 1 else max(size * 3, 30)
+
+        searches = []
+        for leg_query in legs.values():
+            searches.append({"index": self.index_name, "routing": user_id})
+            searches.append({
+                # only fetch what the response needs, descriptions and vectors are large
+                "_source": {
+                    "includes": _source_includes(fields)
+                },
+                "query": {
+                    "bool": {
+                        "must": [leg_query],
+                        "filter": filter_conditions
+                    }
+                },
+                "size": window,
+                "profile": profile
+            })
+
+        try:
+            started_at = time.perf_counter()
+            response = self.es.msearch(searches=searches)
+            timings["msearch_ms"] = (time.perf_counter() - started_at) * 1000
         except ApiError as e:
             print(f"Elasticsearch error: {e.info}")
             raise e
 
-    def get_image_sequence(self, timestamp: datetime, direction: Literal["before", "after"], limit: int = 10, inclusive: bool = False) -> List[Dict[str, Any]]:
+        leg_hits = {}
+        leg_debug = {}
+        for leg, leg_response in zip(legs, response["responses"]):
+            if "error" in leg_response:
+                print(f"Elasticsearch error in {leg} leg: {leg_response['error']}")
+                raise RuntimeError(f"Search {leg} leg failed: {leg_response['error'].get('reason')}")
+
+            leg_hits[leg] = leg_response.get("hits", {}).get("hits", [])
+            leg_debug[leg] = {
+                "took_ms": leg_response.get("took"),
+                "hits": len(leg_hits[leg]),
+            }
+            if profile:
+                leg_debug[leg]["profile"] = leg_response.get("profile")
+
+        started_at = time.perf_counter()
+        if len(leg_hits) == 1:
+            hits = next(iter(leg_hits.values()))
+        else:
+            hits = fuse(
+                leg_hits,
+                strategy=fusion,
+                weights={"lexical": lexical_weight, "vector": 1 - lexical_weight}
+            )
+        timings["fusion_ms"] = (time.perf_counter() - started_at) * 1000
+
+        results = [{
+            "score": hit["_score"],
+            **_format_hit(hit["_source"], fields),
+        } for hit in hits[:size]]
+
+        debug = {
+            "fusion": fusion if len(leg_hits) > 1 else None,
+            "timings": timings,
+            "legs": leg_debug
+        }
+
+        return results, debug
+
+    def prefetch_timelines(self, user_id: str, timestamps: List[Timestamp], limit: int = 10):
+        """
+        Warm the timeline cache around `timestamps`, with the same windows the
+        timeline route asks for when a search result is opened.
+        """
+        for timestamp in timestamps:
+            self.get_image_sequence(user_id=user_id, timestamp=timestamp, direction="before", limit=limit)
+            self.get_image_sequence(user_id=user_id, timestamp=timestamp, direction="after", limit=limit, inclusive=True)
+
+    def get_image_sequence(self, user_id: str, timestamp: datetime, direction: Literal["before", "after"], limit: int = 10, inclusive: bool = False, fields: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        fields = fields or DEFAULT_FIELDS
+
+        cache_key = TimelineCache.key(user_id, timestamp, direction, limit, inclusive, fields)
+        cached = self.timeline_cache.get(cache_key)
+        if cached is not None:
+            return cached
+        snapshot = self.timeline_cache.snapshot()
+
         try:
             if direction == "before":
                 sort_order = "desc"
@@ -341,9 +605,15 @@ class ImageSearchSystem:
 
 
             search_body = {
+                "_source": {
+                    "includes": _source_includes(fields)
+                },
                 "query": {
-                    "range": {
-                        "timestamp": range_query
+                    "bool": {
+                        "filter": [
+                            {"term": {"user_id": user_id}},
+                            {"range": {"timestamp": range_query}}
+                        ]
                     }
                 },
                 "sort": {
@@ -358,44 +628,42 @@ class ImageSearchSystem:
 
             response = self.es.search(
                 index=self.index_name,
-                body=search_body
+                body=search_body,
+                routing=user_id
             )
 
             response_hits = response.get("hits", {}).get("hits", [])
             
-            results = [{
-                "id": hit["_source"]["id"],
-                "timestamp": hit["_source"]["timestamp"],
-                "image_path": f'/storage/{hit["_source"]["image_path"].split("/")[-1]}',
-                "ocr_text": hit["_source"].get("ocr_text"),
-                "description": hit["_source"]["llm_description"],
-                "coords": hit["_source"].get("location"),
-                "address": hit["_source"].get("address"),
-                "city": hit["_source"].get("city"),
-                "state": hit["_source"].get("state"),
-                "zip": hit["_source"].get("zip"),
-                "country": hit["_source"].get("country"),
-                "timestamp": hit["_source"]["timestamp"]
-            } for hit in response_hits]
+            results = [_format_hit(hit["_source"], fields) for hit in response_hits]
             
             # ensure order is always oldest to newest
             if direction == "before":
                 results.reverse()
 
+            self.timeline_cache.put(cache_key, results, snapshot)
             return results
         except Exception:
             traceback.print_exc("Error retrieving image sequence")
             return []
         
-    def get_by_id(self, doc_id: str) -> Optional[Dict[str, Any]]:
+    def get_by_id(self, user_id: str, doc_id: str) -> Optional[Dict[str, Any]]:
         """Retrieve a specific document by its ID."""
         try:
-            result = self.es.get(index=self.index_name, id=doc_id)
+            result = self.es.get(index=self.index_name, id=doc_id, routing=user_id, source_excludes=["*_vector"])
             return result["_source"]
         except Exception as e:
             print(f"Error retrieving document: {e}")
             return None
 
+    def get_memory(self, user_id: str, doc_id: str, fields: Optional[List[str]] = None) -> Optional[Dict[str, Any]]:
+        """Retrieve a single memory in the same shape as the search results, with every field by default."""
+        fields = fields or list(RESPONSE_FIELDS)
+        try:
+            result = self.es.get(index=self.index_name, id=doc_id, routing=user_id, source_includes=_source_includes(fields))
+            return _format_hit(result["_source"], fields)
+        except NotFoundError:
+            return None
+
 
 
 if __name__ == "__main__":    
@@ -406,6 +674,7 @@ if __name__ == "__main__":
     )
 
     hybrid_results = elastic.search_images(
+        user_id="default",
         query="shoes",
         search_type="hybrid"
     )
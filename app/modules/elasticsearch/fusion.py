@@ -0,0 +1,63 @@
+from typing import Any, Dict, List, Literal, Union
+
+FusionStrategy = Union[Literal['rrf'], Literal['weighted']]
+
+
+def reciprocal_rank_fusion(legs: Dict[str, List[Dict[str, Any]]], k: int = 60) -> Dict[str, float]:
+    """
+    Score every hit by the sum of 1 / (k + rank) over the legs it appears in.
+    Only ranks are used, so legs with incomparable score scales fuse cleanly.
+    """
+    scores: Dict[str, float] = {}
+
+    for hits in legs.values():
+        for rank, hit in enumerate(hits, start=1):
+            scores[hit["_id"]] = scores.get(hit["_id"], 0) + 1 / (k + rank)
+
+    return scores
+
+
+def weighted_fusion(legs: Dict[str, List[Dict[str, Any]]], weights: Dict[str, float]) -> Dict[str, float]:
+    """
+    Min-max normalize every leg's scores to [0, 1] and combine them with `weights`,
+    a hit missing from a leg gets 0 for it.
+    """
+    scores: Dict[str, float] = {}
+
+    for leg, hits in legs.items():
+        if not hits:
+            continue
+
+        leg_scores = [hit["_score"] for hit in hits]
+        low, high = min(leg_scores), max(leg_scores)
+
+        for hit in hits:
+            normalized = (hit["_score"] - low) / (high - low) if high > low else 1.0
+            scores[hit["_id"]] = scores.get(hit["_id"], 0) + weights.get(leg, 1.0) * normalized
+
+    return scores
+
+
+def fuse(
+    legs: Dict[str, List[Dict[str, Any]]],
+    strategy: FusionStrategy = "rrf",
+    rrf_k: int = 60,
+    weights: Dict[str, float] = None,
+) -> List[Dict[str, Any]]:
+    """Merge the hits of every leg into a single list ordered by fused score."""
+    if strategy == "rrf":
+        scores = reciprocal_rank_fusion(legs, k=rrf_k)
+    elif strategy == "weighted":
+        scores = weighted_fusion(legs, weights or {})
+    else:
+        raise ValueError(f"Unknown fusion strategy: {strategy}")
+
+    hits_by_id = {}
+    for hits in legs.values():
+        for hit in hits:
+            hits_by_id.setdefault(hit["_id"], hit)
+
+    return [
+        {**hits_by_id[doc_id], "_score": score}
+        for doc_id, score in sorted(scores.items(), key=lambda item: item[1], reverse=True)
+    ]
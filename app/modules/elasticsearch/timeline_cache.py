@@ -0,0 +1,158 @@
+import threading
+import time
+from collections import OrderedDict, deque
+from datetime import datetime, timezone
+from typing import Any, Deque, Dict, Hashable, List, NamedTuple, Optional, Tuple, Union
+
+Timestamp = Union[datetime, str]
+
+
+def normalize_timestamp(timestamp: Timestamp) -> datetime:
+    """Elasticsearch treats timestamps without an offset as UTC, so do the same here."""
+    if isinstance(timestamp, str):
+        timestamp = datetime.fromisoformat(timestamp)
+
+    if timestamp.tzinfo is None:
+        return timestamp.replace(tzinfo=timezone.utc)
+
+    return timestamp.astimezone(timezone.utc)
+
+
+class TimelineWindow(NamedTuple):
+    user_id: str
+    # the range of time the results were taken from, a new memory inside it changes the window
+    start: Optional[datetime]
+    end: Optional[datetime]
+    results: List[Dict[str, Any]]
+    expires_at: float
+
+    def covers(self, user_id: str, timestamp: datetime) -> bool:
+        return (
+            self.user_id == user_id
+            and (self.start is None or self.start <= timestamp)
+            and (self.end is None or timestamp <= self.end)
+        )
+
+
+class QuerySnapshot(NamedTuple):
+    generation: int
+    started_at: float
+
+
+class TimelineCache:
+    """
+    Bounded LRU cache of timeline windows around a timestamp.
+
+    Ingest invalidates every window whose time range covers the new memory. A
+    query can still come back without the new memory if it was already running
+    when that happened, or if it ran before elasticsearch refreshed and made the
+    memory searchable. So `put` takes a snapshot from before the query started,
+    and drops windows that an invalidation since then, or within a refresh
+    interval before it, would have covered. The cache is per process, so the
+    TTL bounds how stale a window can get when the memory was ingested by
+    another worker.
+    """
+
+    def __init__(self, max_entries: int = 512, ttl_seconds: float = 300, refresh_interval: float = 1):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        # elasticsearch's index.refresh_interval, how long an indexed memory may stay invisible
+        self.refresh_interval = refresh_interval
+        self.entries: "OrderedDict[Hashable, TimelineWindow]" = OrderedDict()
+        # bumped by every invalidation, recent ones are kept to check late `put`s against
+        self.generation = 0
+        self.invalidations: Deque[Tuple[int, float, str, datetime]] = deque(maxlen=1024)
+        # ingest runs in the threadpool while reads happen on the event loop
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def key(
+        user_id: str,
+        timestamp: Timestamp,
+        direction: str,
+        limit: int,
+        inclusive: bool,
+        fields: List[str],
+    ) -> Tuple:
+        return (user_id, normalize_timestamp(timestamp), direction, limit, inclusive, tuple(fields))
+
+    def get(self, key: Tuple) -> Optional[List[Dict[str, Any]]]:
+        with self.lock:
+            window = self.entries.get(key)
+            if window is None:
+                return None
+
+            if window.expires_at < time.monotonic():
+                del self.entries[key]
+                return None
+
+            self.entries.move_to_end(key)
+            return list(window.results)
+
+    def snapshot(self) -> QuerySnapshot:
+        """Take this before running the query whose results will be `put`."""
+        with self.lock:
+            return QuerySnapshot(self.generation, time.monotonic())
+
+    def _may_be_missing(self, window: TimelineWindow, snapshot: QuerySnapshot) -> bool:
+        """Whether a memory ingested around the query could be missing from its results."""
+        # anything invalidated this long before the query started was already searchable
+        visible_before = snapshot.started_at - self.refresh_interval
+
+        # the invalidations that matter aren't all known anymore, play it safe
+        if self.invalidations:
+            oldest_generation, oldest_at, _, _ = self.invalidations[0]
+            if oldest_generation > snapshot.generation + 1:
+                return True
+            if len(self.invalidations) == self.invalidations.maxlen and oldest_at > visible_before:
+                return True
+
+        return any(
+            (generation > snapshot.generation or invalidated_at > visible_before)
+            and window.covers(user_id, timestamp)
+            for generation, invalidated_at, user_id, timestamp in self.invalidations
+        )
+
+    def put(self, key: Tuple, results: List[Dict[str, Any]], snapshot: QuerySnapshot):
+        user_id, anchor, direction, limit = key[:4]
+        timestamps = [normalize_timestamp(result["timestamp"]) for result in results if result.get("timestamp")]
+
+        # a window with fewer results than asked for reaches to the end of the timeline
+        if direction == "before":
+            start = min(timestamps) if len(results) >= limit and timestamps else None
+            end = anchor
+        else:
+            start = anchor
+            end = max(timestamps) if len(results) >= limit and timestamps else None
+
+        window = TimelineWindow(
+            user_id=user_id,
+            start=start,
+            end=end,
+            results=list(results),
+            expires_at=time.monotonic() + self.ttl_seconds
+        )
+
+        with self.lock:
+            if self._may_be_missing(window, snapshot):
+                return
+
+            self.entries[key] = window
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def invalidate(self, user_id: str, timestamp: Optional[Timestamp]):
+        """Drop every cached window of the user that covers `timestamp`."""
+        if timestamp is None:
+            return
+
+        timestamp = normalize_timestamp(timestamp)
+
+        with self.lock:
+            self.generation += 1
+            self.invalidations.append((self.generation, time.monotonic(), user_id, timestamp))
+
+            stale = [key for key, window in self.entries.items() if window.covers(user_id, timestamp)]
+            for key in stale:
+                del self.entries[key]
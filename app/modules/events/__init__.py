@@ -0,0 +1,3 @@
+from .bus import Event, EventBus, Subscription
+
+events = EventBus()
@@ -0,0 +1,85 @@
+import asyncio
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Deque, Dict, Optional, Set
+
+
+@dataclass
+class Event:
+    type: str
+    data: Dict[str, Any]
+    user_id: Optional[str] = None
+
+
+@dataclass(eq=False)
+class Subscription:
+    """A single subscriber's bounded buffer, the oldest events are dropped when it fills up."""
+    user_id: Optional[str]
+    max_buffer: int
+    loop: asyncio.AbstractEventLoop
+    buffer: Deque[Event] = field(init=False)
+    ready: asyncio.Event = field(default_factory=asyncio.Event)
+    dropped: int = 0
+
+    def __post_init__(self):
+        self.buffer = deque(maxlen=self.max_buffer)
+
+    def push(self, event: Event):
+        if len(self.buffer) == self.max_buffer:
+            self.dropped += 1
+        self.buffer.append(event)
+        # publishers may live on another thread, only the subscriber's loop may touch `ready`
+        self.loop.call_soon_threadsafe(self.ready.set)
+
+    async def get(self, timeout: Optional[float] = None) -> Optional[Event]:
+        """Wait for the next event, returns None if nothing arrived within `timeout`."""
+        if not self.buffer:
+            self.ready.clear()
+            try:
+                await asyncio.wait_for(self.ready.wait(), timeout)
+            except asyncio.TimeoutError:
+                return None
+
+        return self.buffer.popleft() if self.buffer else None
+
+
+class EventBus:
+    """
+    In-process pub/sub used to push ingest progress to connected clients.
+
+    Publishing never blocks: every subscriber has a bounded buffer and a slow
+    subscriber only loses its own oldest events.
+    """
+
+    def __init__(self, max_buffer: int = 100):
+        self.max_buffer = max_buffer
+        self.subscriptions: Set[Subscription] = set()
+
+    def subscribe(self, user_id: Optional[str] = None) -> Subscription:
+        subscription = Subscription(
+            user_id=user_id,
+            max_buffer=self.max_buffer,
+            loop=asyncio.get_running_loop()
+        )
+        self.subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        self.subscriptions.discard(subscription)
+
+    def publish(self, type: str, data: Dict[str, Any], user_id: Optional[str] = None):
+        event = Event(type=type, data=data, user_id=user_id)
+
+        # copy, subscribers may come and go while we're publishing from another thread
+        for subscription in list(self.subscriptions):
+            if subscription.user_id is None or subscription.user_id == user_id:
+                subscription.push(event)
+
+    async def listen(self, user_id: Optional[str] = None, heartbeat: float = 15) -> AsyncIterator[Optional[Event]]:
+        """Yield events as they arrive, or None every `heartbeat` seconds when idle."""
+        subscription = self.subscribe(user_id)
+        try:
+            while True:
+                yield await subscription.get(timeout=heartbeat)
+        finally:
+            self.unsubscribe(subscription)
@@ -1,5 +1,5 @@
 from io import BytesIO
-from typing import NamedTuple
+from typing import Callable, NamedTuple, Optional
 
 from PIL import Image
 
@@ -11,11 +11,15 @@ class ImageMetadata(NamedTuple):
     ocr: str
 
 
-def extract_metadata_from_image(content: bytes):
+def extract_metadata_from_image(content: bytes, on_stage: Optional[Callable[[str], None]] = None):
     image = BytesIO(content)
     image_file = Image.open(image)
     description = describe_image(image_file)
+    if on_stage:
+        on_stage("described")
     ocr = extract_text_from_image(image_file)
+    if on_stage:
+        on_stage("ocr")
 
     return ImageMetadata(description=description, ocr=ocr)
 
@@ -0,0 +1,101 @@
+import subprocess
+import wave
+from io import BytesIO
+from typing import List, NamedTuple, Optional
+
+import numpy as np
+
+SAMPLE_RATE = 16000
+# 30ms analysis frames
+FRAME_SIZE = SAMPLE_RATE * 30 // 1000
+
+
+class AudioChunk(NamedTuple):
+    index: int
+    offset_seconds: float
+    duration_seconds: float
+    wav: bytes
+
+
+def decode_audio(path: str) -> np.ndarray:
+    """Decode any audio file ffmpeg understands into 16kHz mono 16-bit samples."""
+    result = subprocess.run(
+        [
+            "ffmpeg", "-nostdin", "-loglevel", "error",
+            "-i", path,
+            "-ac", "1", "-ar", str(SAMPLE_RATE),
+            "-f", "s16le", "-",
+        ],
+        capture_output=True,
+        check=True,
+    )
+
+    return np.frombuffer(result.stdout, dtype=np.int16)
+
+
+def _to_wav(samples: np.ndarray) -> bytes:
+    io = BytesIO()
+
+    with wave.open(io, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(SAMPLE_RATE)
+        wav.writeframes(samples.tobytes())
+
+    return io.getvalue()
+
+
+def split_on_silence(
+    samples: np.ndarray,
+    min_chunk_seconds: Optional[float] = None,
+    max_chunk_seconds: float = 60,
+    silence_seconds: float = 0.5,
+) -> List[AudioChunk]:
+    """
+    Split audio into chunks of at most `max_chunk_seconds`, cutting at the
+    quietest `silence_seconds` stretch after `min_chunk_seconds` so words
+    aren't cut in half. `min_chunk_seconds` defaults to a third of the
+    maximum, capped at 20 seconds.
+    """
+    if min_chunk_seconds is None:
+        min_chunk_seconds = min(20, max_chunk_seconds / 3)
+    if not 0 <= min_chunk_seconds < max_chunk_seconds:
+        raise ValueError("min_chunk_seconds has to be between 0 and max_chunk_seconds")
+
+    frame_count = len(samples) // FRAME_SIZE
+    if frame_count == 0:
+        return [AudioChunk(0, 0.0, len(samples) / SAMPLE_RATE, _to_wav(samples))] if len(samples) else []
+
+    frames = samples[:frame_count * FRAME_SIZE].astype(np.float32).reshape(frame_count, FRAME_SIZE)
+    energy = np.sqrt(np.mean(frames ** 2, axis=1))
+
+    # average over the silence window so a single quiet frame mid-word doesn't win
+    window = max(1, int(silence_seconds * SAMPLE_RATE / FRAME_SIZE))
+    smoothed = np.convolve(energy, np.ones(window) / window, mode="same")
+
+    frames_per_second = SAMPLE_RATE / FRAME_SIZE
+    # every chunk is at least a frame long and has at least one frame to cut at
+    min_frames = max(1, int(min_chunk_seconds * frames_per_second))
+    max_frames = max(min_frames + 1, int(max_chunk_seconds * frames_per_second))
+
+    cuts = [0]
+    while frame_count - cuts[-1] > max_frames:
+        start = cuts[-1]
+        search = smoothed[start + min_frames:start + max_frames]
+        cuts.append(start + min_frames + int(np.argmin(search)))
+    cuts.append(frame_count)
+
+    chunks = []
+    for index, (start_frame, end_frame) in enumerate(zip(cuts, cuts[1:])):
+        start = start_frame * FRAME_SIZE
+        # the last chunk keeps the samples that don't fill a whole frame
+        end = len(samples) if end_frame == frame_count else end_frame * FRAME_SIZE
+
+        chunks.append(AudioChunk(
+            index=index,
+            offset_seconds=start / SAMPLE_RATE,
+            duration_seconds=(end - start) / SAMPLE_RATE,
+            wav=_to_wav(samples[start:end]),
+        ))
+
+    return chunks
@@ -9,20 +9,21 @@ from app.core.settings import settings
 
 client = OpenAI(api_key=settings.openai_api_key)
 
-def get_audio_transcription(audio: bytes) -> str:
+def get_audio_transcription(audio: bytes, filename: str = "audio.wav") -> str:
     """
     Transcribes audio data to text.
 
     Args:
-        audio (bytes): _description_
+        audio (bytes): encoded audio, the API has a 25MB limit so long recordings need to be chunked
+        filename (str, optional): the API uses the extension to detect the format. Defaults to "audio.wav".
 
     Returns:
-        str: _description_
+        str: the transcribed text
     """
 
     transcription = client.audio.transcriptions.create(
         model="whisper-1",
-        file=audio
+        file=(filename, audio)
     )
     
     return transcription.text
@@ -0,0 +1,12 @@
+from fastapi import APIRouter
+
+from app.modules.admission import admission
+
+router = APIRouter(prefix="/admission", tags=["admission"])
+
+
+@router.get("/")
+async def read_admission_stats():
+    """Queue depth, wait times and shed counts of every admission lane."""
+
+    return admission.stats()
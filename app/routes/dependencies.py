@@ -0,0 +1,25 @@
+from typing import List, Optional
+from fastapi import Header, HTTPException, Query
+
+from app.core.settings import settings
+from app.modules.elasticsearch import RESPONSE_FIELDS
+
+
+def get_user_id(x_user_id: Optional[str] = Header(None)) -> str:
+    # there is no auth yet, so the client identifies the user with a header
+    return x_user_id or settings.default_user_id
+
+
+def parse_fields(fields: Optional[str] = Query(None, description="comma separated response fields, or `all`")) -> Optional[List[str]]:
+    if not fields:
+        return None
+
+    if fields == "all":
+        return list(RESPONSE_FIELDS)
+
+    requested = [field.strip() for field in fields.split(",") if field.strip()]
+    unknown = [field for field in requested if field not in RESPONSE_FIELDS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+
+    return requested
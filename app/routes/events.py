@@ -0,0 +1,38 @@
+import json
+from fastapi import APIRouter, Depends, Request
+from fastapi.responses import StreamingResponse
+
+from app.modules.events import events
+from app.routes.dependencies import get_user_id
+
+router = APIRouter(prefix="/events", tags=["events"])
+
+
+@router.get("/")
+async def stream_events(request: Request, user_id: str = Depends(get_user_id)):
+    """
+    Server-sent events stream of the user's upload progress (`upload` events)
+    and newly indexed memories (`memory` events), replaces polling the timeline.
+    """
+
+    async def event_stream():
+        async for event in events.listen(user_id=user_id):
+            if await request.is_disconnected():
+                break
+
+            if event is None:
+                # keeps proxies from closing an idle connection
+                yield ": heartbeat\n\n"
+                continue
+
+            yield f"event: {event.type}\ndata: {json.dumps(event.data)}\n\n"
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            # don't let a reverse proxy buffer the stream
+            "X-Accel-Buffering": "no",
+        }
+    )
@@ -1,14 +1,48 @@
 from datetime import datetime
-from typing import Literal
-from fastapi import APIRouter, Depends, HTTPException, Query
+import threading
+from typing import List, Literal, Optional
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import ORJSONResponse
 
+from app.core.settings import settings
 from app.schema import MemoryQuery
+from app.modules.admission import admission
 from app.modules.elasticsearch import elastic
+from app.routes.dependencies import get_user_id, parse_fields
 
-router = APIRouter(prefix="/memory", tags=["memory"])
+# the handlers return an ORJSONResponse themselves, returning a dict would make FastAPI
+# walk every value with jsonable_encoder before orjson ever sees it
+router = APIRouter(prefix="/memory", tags=["memory"], default_response_class=ORJSONResponse)
+
+# prefetches run after the admission slot is released, so they get their own small budget
+prefetch_slots = threading.BoundedSemaphore(settings.timeline_prefetch_concurrency)
+
+
+def prefetch_timelines(user_id: str, timestamps: List[str]):
+    """Best effort, dropped when searches are queueing or enough prefetches are already running."""
+    if admission.lanes["interactive"].waiters:
+        return
+
+    if not prefetch_slots.acquire(blocking=False):
+        return
+
+    try:
+        elastic.prefetch_timelines(user_id, timestamps)
+    finally:
+        prefetch_slots.release()
+
+
+# the embedding and elasticsearch calls block, they run in the threadpool so the
+# event loop stays free and the admission lane's concurrency budget actually applies
 
 @router.get("/")
-async def read_memories(query: MemoryQuery = Depends()):
+async def read_memories(
+    background_tasks: BackgroundTasks,
+    query: MemoryQuery = Depends(),
+    user_id: str = Depends(get_user_id),
+    fields: Optional[List[str]] = Depends(parse_fields)
+    ):
     """Get all memories."""
 
     location_filters = None
@@ -25,16 +59,37 @@ async def read_memories(query: MemoryQuery = Depends()):
     if query.end:
         temporal_filters["end"] = query.end
 
-    hybrid_results = elastic.search_images(
+    search_kwargs = {
+        "location_filters": location_filters,
+        "temporal_filters": temporal_filters,
+        "search_type": "hybrid",
+        "fields": fields,
+        "fusion": query.fusion or settings.search_fusion,
+        "lexical_weight": query.lexical_weight if query.lexical_weight is not None else settings.search_lexical_weight,
+        "fuzziness": query.fuzziness or settings.search_fuzziness,
+    }
+
+    if query.debug:
+        return ORJSONResponse(await run_in_threadpool(elastic.search_images, user_id=user_id, query=query.query, debug=True, **search_kwargs))
+
+    hybrid_results = await run_in_threadpool(
+        elastic.search_images,
+        user_id=user_id,
         query=query.query,
-        location_filters=location_filters,
-        temporal_filters=temporal_filters,
-        search_type="hybrid"
+        **search_kwargs
     )
 
-    return {
+    # the next request is usually the timeline around one of the top hits, have it ready
+    top_timestamps = [
+        result["timestamp"] for result in hybrid_results[:settings.timeline_prefetch_top_k]
+        if result.get("timestamp")
+    ]
+    if top_timestamps:
+        background_tasks.add_task(prefetch_timelines, user_id, top_timestamps)
+
+    return ORJSONResponse({
         "memories": hybrid_results
-    }
+    }, background=background_tasks)
 
        
 # Custom dependency to preprocess the timestamp
@@ -54,32 +109,57 @@ def parse_timestamp(timestamp: str = Query(...)) -> datetime:
 async def read_temporal_memory(
     direction: Literal["before", "after", "both"],
     timestamp: datetime = Depends(parse_timestamp),
-    limit: int = 10
+    limit: int = 10,
+    user_id: str = Depends(get_user_id),
+    fields: Optional[List[str]] = Depends(parse_fields)
     ):
     """Get a memory by ID."""
 
     if direction == "both":
         elastic_results = []
-        elastic_results.extend(elastic.get_image_sequence(
+        elastic_results.extend(await run_in_threadpool(
+            elastic.get_image_sequence,
+            user_id=user_id,
             timestamp=timestamp,
             direction="before",
             limit=limit,
+            fields=fields,
             # inclusive=True
         ))
-        elastic_results.extend(elastic.get_image_sequence(
+        elastic_results.extend(await run_in_threadpool(
+            elastic.get_image_sequence,
+            user_id=user_id,
             timestamp=timestamp,
             direction="after",
             limit=limit,
-            inclusive=True
+            inclusive=True,
+            fields=fields
         ))
     else:
-        elastic_results = elastic.get_image_sequence(
+        elastic_results = await run_in_threadpool(
+            elastic.get_image_sequence,
+            user_id=user_id,
             timestamp=timestamp,
             direction=direction,
             limit=limit,
+            fields=fields,
         )
 
-    return {
+    return ORJSONResponse({
         "memories": elastic_results
-    }
+    })
+
+
+@router.get("/{memory_id}")
+async def read_memory(
+    memory_id: str,
+    user_id: str = Depends(get_user_id),
+    fields: Optional[List[str]] = Depends(parse_fields)
+    ):
+    """Get the full details of a single memory."""
+
+    memory = await run_in_threadpool(elastic.get_memory, user_id=user_id, doc_id=memory_id, fields=fields)
+    if memory is None:
+        raise HTTPException(status_code=404, detail="Memory not found")
 
+    return ORJSONResponse(memory)
@@ -1,16 +1,23 @@
 from decimal import Decimal
 from random import randint
 import traceback
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, File, Form, HTTPException, UploadFile
+from fastapi.concurrency import run_in_threadpool
 from openai import BaseModel
-from datetime import datetime
+from datetime import datetime, timedelta
+import asyncio
 import os
 from typing import Optional
 import base64
+import uuid
 
 from app.modules.elasticsearch import elastic
+from app.modules.events import events
 from app.modules.geoapify.api import reverse_geocode
 from app.modules.metadata_extraction import extract_metadata_from_image
+from app.modules.metadata_extraction.audio import AudioChunk, decode_audio, split_on_silence
+from app.modules.metadata_extraction.description import get_audio_transcription
+from app.routes.dependencies import get_user_id
 from app.core.settings import settings
 
 router = APIRouter(prefix='/upload')
@@ -23,15 +30,33 @@ class UploadMemoryRequest(BaseModel):
     image: str
     location: Optional[str] = None
     timestamp: Optional[str] = None
+    # lets the client match progress events on /api/events/ to this upload
+    upload_id: Optional[str] = None
+
+
+def reverse_geocode_fields(lat: Decimal, long: Decimal) -> dict:
+    reverse_geocode_result = reverse_geocode(lat, long)
+    return {
+        "city": reverse_geocode_result.get('city', ''),
+        "state": reverse_geocode_result.get('state', ''),
+        "zip": reverse_geocode_result.get('postcode', ''),
+        "country": reverse_geocode_result.get('country', ''),
+        "address": reverse_geocode_result.get('formatted', '')
+    } if reverse_geocode_result else {}
     
 
 @router.post("/")
 async def upload_memory(
     memory: UploadMemoryRequest,
+    user_id: str = Depends(get_user_id),
 ):
     image = memory.image
     location = memory.location
     timestamp = memory.timestamp
+    upload_id = memory.upload_id or str(uuid.uuid4())
+
+    def publish_stage(stage: str, **data):
+        events.publish("upload", {"upload_id": upload_id, "stage": stage, **data}, user_id=user_id)
 
     try:
         if "base64," in image:
@@ -54,25 +79,23 @@ async def upload_memory(
         
         with open(file_path, "wb") as f:
             f.write(image_bytes)
+        publish_stage("stored")
 
         if lat and long:
-            reverse_geocode_result = reverse_geocode(lat, long)
-            geocode_model_kwargs = {
-                "city": reverse_geocode_result.get('city', ''),
-                "state": reverse_geocode_result.get('state', ''),
-                "zip": reverse_geocode_result.get('postcode', ''),
-                "country": reverse_geocode_result.get('country', ''),
-                "address": reverse_geocode_result.get('formatted', '')
-            } if reverse_geocode_result else {}
+            geocode_model_kwargs = await run_in_threadpool(reverse_geocode_fields, lat, long)
+            publish_stage("geocoded")
         else:
             geocode_model_kwargs = {}
             # hacky way to handle missing location data
             long = Decimal(0)
             lat = Decimal(0)
 
-        metadata = extract_metadata_from_image(image_bytes)
+        # the slow steps run off the event loop so progress events reach subscribers as they happen
+        metadata = await run_in_threadpool(extract_metadata_from_image, image_bytes, on_stage=publish_stage)
 
-        doc_id = elastic.ingest_image_metadata(
+        doc_id = await run_in_threadpool(
+            elastic.ingest_image_metadata,
+            user_id=user_id,
             image_path=filename,
             timestamp=timestamp_obj,
             llm_description=metadata.description,
@@ -85,10 +108,20 @@ async def upload_memory(
             # tags=["sunset", "beach", "palm trees", "miami"],
             # additional_metadata={}
         )
+        publish_stage("indexed", id=doc_id)
+
+        events.publish("memory", {
+            "id": doc_id,
+            "timestamp": timestamp_obj.isoformat(),
+            "image_path": f'/storage/{filename}',
+            "coords": {"lat": float(lat), "lon": float(long)},
+            "city": geocode_model_kwargs.get("city"),
+        }, user_id=user_id)
 
         return {
             "status": "success",
-            "id": doc_id
+            "id": doc_id,
+            "upload_id": upload_id
         }
         
     except Exception as e:
@@ -97,8 +130,130 @@ async def upload_memory(
             os.remove(file_path)
 
         traceback.print_exc()
+        publish_stage("failed", error=str(e))
         
         raise HTTPException(
             status_code=500,
             detail=f"Failed to upload memory: {str(e)}"
         )
+
+
+@router.post("/audio")
+async def upload_audio_memory(
+    audio: UploadFile = File(...),
+    location: Optional[str] = Form(None),
+    timestamp: Optional[str] = Form(None),
+    upload_id: Optional[str] = Form(None),
+    user_id: str = Depends(get_user_id),
+):
+    """
+    Ingest an audio recording. It's split on silence into chunks that are
+    transcribed concurrently, and every segment is indexed as soon as its
+    transcription lands so long recordings become searchable incrementally.
+    """
+    upload_id = upload_id or str(uuid.uuid4())
+    recording_id = str(uuid.uuid4())
+    segment_ids = []
+    transcriptions = []
+
+    def publish_stage(stage: str, **data):
+        events.publish("upload", {"upload_id": upload_id, "stage": stage, **data}, user_id=user_id)
+
+    try:
+        timestamp_obj = datetime.fromisoformat(timestamp) if timestamp else datetime.now()
+        extension = os.path.splitext(audio.filename or "")[1] or ".m4a"
+        filename = f"audio_{timestamp_obj.strftime('%Y-%m-%d_%H-%M-%S')}-{randint(0,10000)}{extension}"
+        file_path = os.path.join(UPLOAD_DIR, filename)
+
+        # stream to disk rather than holding the whole recording in memory
+        with open(file_path, "wb") as f:
+            while chunk := await audio.read(1024 * 1024):
+                f.write(chunk)
+        publish_stage("stored")
+
+        location_data = None
+        if location:
+            lat, long = map(Decimal, location.split(","))
+            location_data = {
+                "latitude": lat,
+                "longitude": long,
+                **await run_in_threadpool(reverse_geocode_fields, lat, long)
+            }
+            publish_stage("geocoded")
+
+        samples = await run_in_threadpool(decode_audio, file_path)
+        chunks = await run_in_threadpool(
+            split_on_silence,
+            samples,
+            max_chunk_seconds=settings.audio_max_chunk_seconds
+        )
+        publish_stage("split", chunks=len(chunks))
+
+        semaphore = asyncio.Semaphore(settings.transcription_concurrency)
+
+        async def transcribe(chunk: AudioChunk):
+            async with semaphore:
+                text = await run_in_threadpool(get_audio_transcription, chunk.wav, f"chunk-{chunk.index}.wav")
+            return chunk, text.strip()
+
+        transcripts = {}
+        transcriptions = [asyncio.create_task(transcribe(chunk)) for chunk in chunks]
+        for next_transcription in asyncio.as_completed(transcriptions):
+            chunk, text = await next_transcription
+            transcripts[chunk.index] = text
+            publish_stage("transcribed", chunk=chunk.index, chunks=len(chunks))
+
+            if not text:
+                continue
+
+            segment_timestamp = timestamp_obj + timedelta(seconds=chunk.offset_seconds)
+            doc_id = await run_in_threadpool(
+                elastic.ingest_audio_segment,
+                user_id=user_id,
+                audio_path=filename,
+                recording_id=recording_id,
+                segment_index=chunk.index,
+                transcript=text,
+                timestamp=segment_timestamp,
+                offset_seconds=chunk.offset_seconds,
+                duration_seconds=chunk.duration_seconds,
+                location_data=location_data,
+            )
+            segment_ids.append(doc_id)
+
+            events.publish("memory", {
+                "id": doc_id,
+                "timestamp": segment_timestamp.isoformat(),
+                "media_type": "audio",
+                "audio_path": f'/storage/{filename}',
+                "offset_seconds": chunk.offset_seconds,
+            }, user_id=user_id)
+
+        publish_stage("indexed", ids=segment_ids)
+
+        return {
+            "status": "success",
+            "recording_id": recording_id,
+            "ids": segment_ids,
+            "transcript": " ".join(transcripts[i] for i in sorted(transcripts) if transcripts[i]),
+            "upload_id": upload_id
+        }
+
+    except Exception as e:
+        # don't leave the remaining transcriptions running with nobody to index them
+        for transcription in transcriptions:
+            transcription.cancel()
+        if transcriptions:
+            await asyncio.gather(*transcriptions, return_exceptions=True)
+
+        # segments that were already indexed still point at the recording
+        if not segment_ids and 'file_path' in locals() and os.path.exists(file_path):
+            os.remove(file_path)
+
+        traceback.print_exc()
+        publish_stage("failed", error=str(e))
+
+        raise HTTPException(
+            status_code=500,
+            detail=f"Failed to upload audio memory: {str(e)}"
+        )
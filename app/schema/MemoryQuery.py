@@ -1,6 +1,6 @@
 from datetime import datetime
-from typing import Optional
-from pydantic import BaseModel
+from typing import Literal, Optional
+from pydantic import BaseModel, Field
 
 class MemoryQuery(BaseModel):
     query: str
@@ -8,4 +8,10 @@ class MemoryQuery(BaseModel):
     lat: Optional[float] = None
     radius: Optional[float] = None
     start: Optional[datetime] = None
-    end: Optional[datetime] = None
\ No newline at end of file
+    end: Optional[datetime] = None
+    # tuning knobs for hybrid search, unset ones fall back to the settings
+    fusion: Optional[Literal['rrf', 'weighted']] = None
+    lexical_weight: Optional[float] = Field(None, ge=0, le=1)
+    fuzziness: Optional[str] = None
+    # include per-leg timings and the elasticsearch profile in the response
+    debug: bool = False
\ No newline at end of file